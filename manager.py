@@ -3,7 +3,10 @@ import json
 import threading
 import time
 import os
+import queue
+import atexit
 import requests
+import concurrent.futures
 from flask import Flask, jsonify, request
 
 # Configurações iniciais
@@ -11,12 +14,35 @@ RABBIT_HOST = "localhost"
 
 nodes = {}  # Armazena informações dos nós conectados
 files = {}  # Armazena informações dos arquivos e suas localizações
+node_chunks = {}  # Índice reverso: node_url -> {(filename, chunk_index)}
+corrupt_replicas = set()  # (filename, chunk_index, node_url) corrompidas e mantidas por falta de outra cópia íntegra
+replica_mtimes = {}  # (filename, chunk_index, node_url) -> mtime_ns do chunk informado pelo nó
+files_lock = threading.RLock()  # Protege files, node_chunks e replica_mtimes entre as threads
 
 TIMEOUT = 15  # Tempo máximo para considerar um nó como ativo
 REPLICATION_QUEUE = 'replication_queue'
 REPLICATION_FACTOR = 2  # Quantidade mínima de réplicas por chunk
 CHUNK_SIZE = 128 * 1024 * 1024  # Tamanho padrão de chunk
 LOG_FILE = 'audit_log.txt'
+FAILURE_CHECK_INTERVAL = 2  # Intervalo entre verificações de nós expirados
+SWEEP_INTERVAL = 300  # Intervalo da varredura completa de baixa frequência
+REPAIR_POLL_INTERVAL = 5  # Espera máxima na repair_queue antes de atender o heartbeat do RabbitMQ
+REPAIR_RETRY_INTERVAL = 5  # Espera antes de reconectar ao RabbitMQ após uma falha
+LOG_BATCH_SIZE = 100  # Quantidade de linhas acumuladas antes de gravar no disco
+LOG_FLUSH_INTERVAL = 1  # Tempo máximo que uma linha fica no buffer
+LOG_MAX_BYTES = 10 * 1024 * 1024  # Tamanho máximo do log antes da rotação
+LOG_BACKUP_COUNT = 5  # Quantidade de arquivos de log antigos mantidos
+LOG_SUPPRESS_WINDOW = 60  # Janela em que eventos idênticos repetidos são suprimidos
+LOG_SUPPRESSED_OPERATIONS = {"NODE FAILURE", "CORRUPT", "CHUNK LOST"}  # Operações ruidosas sujeitas à supressão
+GC_INTERVAL = 5  # Intervalo entre execuções do coletor de lixo
+GC_REQUEST_TIMEOUT = 10  # Tempo máximo de espera por um nó durante a remoção
+
+repair_queue = queue.Queue()  # Chunks (filename, chunk_index) aguardando reparo
+pending_repairs = set()  # Evita enfileirar o mesmo chunk mais de uma vez
+failed_nodes = set()  # Nós já detectados como inativos
+log_queue = queue.Queue()  # Linhas aguardando gravação pelo log_writer
+pending_deletes = {}  # node_url -> {(filename, chunk_index): mtime_ns da cópia a apagar (None se ainda desconhecido)}
+gc_lock = threading.Lock()
 
 app = Flask(__name__)
 
@@ -31,9 +57,94 @@ def clear_terminal():
     os.system('cls' if os.name == 'nt' else 'clear')
 
 def log_operation(operation, details):
-    # Registra operações no arquivo de log
+    # Enfileira a operação para o log_writer, sem bloquear quem chamou
+    log_queue.put((time.time(), operation, details))
+
+def rotate_log():
+    # Renomeia audit_log.txt -> audit_log.txt.1 -> ... descartando o mais antigo
+    for i in range(LOG_BACKUP_COUNT - 1, 0, -1):
+        if os.path.exists(f"{LOG_FILE}.{i}"):
+            os.replace(f"{LOG_FILE}.{i}", f"{LOG_FILE}.{i + 1}")
+    os.replace(LOG_FILE, f"{LOG_FILE}.1")
+
+def write_log_lines(lines):
+    # Grava um lote de linhas no log, rotacionando o arquivo se necessário
+    if os.path.exists(LOG_FILE) and os.path.getsize(LOG_FILE) >= LOG_MAX_BYTES:
+        rotate_log()
     with open(LOG_FILE, 'a') as log:
-        log.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')} - {operation} - {details}\n")
+        log.writelines(lines)
+
+def format_log_line(timestamp, operation, details):
+    return f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))} - {operation} - {details}\n"
+
+def flush_suppressed(last_seen, now, force=False):
+    # Remove eventos cuja janela de supressão expirou e devolve o resumo das repetições
+    lines = []
+    for key, (first_seen, repeats) in list(last_seen.items()):
+        if force or now - first_seen >= LOG_SUPPRESS_WINDOW:
+            if repeats:
+                operation, details = key
+                lines.append(format_log_line(now, operation, f"{details} (repetido {repeats} vezes)"))
+            del last_seen[key]
+    return lines
+
+def log_writer():
+    # Agrupa as linhas da log_queue e grava por tamanho do lote ou por tempo
+    buffer = []
+    last_seen = {}  # (operation, details) -> [início da janela, repetições suprimidas]
+    last_flush = time.time()
+
+    while True:
+        try:
+            entry = log_queue.get(timeout=LOG_FLUSH_INTERVAL)
+        except queue.Empty:
+            entry = ()
+
+        if entry is None:
+            # Sinal de encerramento: grava tudo o que restou
+            buffer.extend(flush_suppressed(last_seen, time.time(), force=True))
+            if buffer:
+                write_log_lines(buffer)
+            return
+
+        if entry:
+            timestamp, operation, details = entry
+            key = (operation, details)
+            if operation not in LOG_SUPPRESSED_OPERATIONS:
+                # Eventos de auditoria (REGISTER, REMOVE, ...) são sempre gravados com o próprio horário
+                buffer.append(format_log_line(timestamp, operation, details))
+            elif key in last_seen:
+                last_seen[key][1] += 1
+            else:
+                last_seen[key] = [timestamp, 0]
+                buffer.append(format_log_line(timestamp, operation, details))
+
+        now = time.time()
+        if len(buffer) >= LOG_BATCH_SIZE or now - last_flush >= LOG_FLUSH_INTERVAL:
+            buffer.extend(flush_suppressed(last_seen, now))
+            if buffer:
+                try:
+                    write_log_lines(buffer)
+                    buffer = []
+                except Exception as e:
+                    # Mantém o lote no buffer para tentar novamente no próximo flush
+                    print(f"Erro ao gravar log: {e}")
+            last_flush = now
+
+def stop_log_writer():
+    # Garante que as linhas ainda no buffer sejam gravadas ao encerrar o manager
+    log_queue.put(None)
+    log_writer_thread.join(timeout=5)
+
+log_writer_thread = threading.Thread(target=log_writer, daemon=True)
+
+def files_snapshot(filename=None):
+    # Copia o registro de arquivos (ou de um único arquivo) sob o files_lock
+    with files_lock:
+        if filename is not None:
+            return {chunk_index: list(node_urls) for chunk_index, node_urls in files.get(filename, {}).items()}
+        return {name: {chunk_index: list(node_urls) for chunk_index, node_urls in chunks.items()}
+                for name, chunks in files.items()}
 
 def print_dashboard():
     # painel de controle no terminal atualizando a cada 3 segundos
@@ -49,16 +160,17 @@ def print_dashboard():
         else:
             print(f"{'Node ID':<20} {'Node URL':<30} {'Status':<10} {'Último Heartbeat'}")
             print("-" * 80)
-            for node_id, info in nodes.items():
+            for node_id, info in list(nodes.items()):
                 elapsed = now - info["last_heartbeat"]
                 status = "Ativo" if elapsed < TIMEOUT else "Inativo"
                 print(f"{node_id:<20} {info['node_url']:<30} {status:<10} {elapsed:.1f} s atrás")
 
         print("\nArquivos Registrados:")
-        if not files:
+        snapshot = files_snapshot()
+        if not snapshot:
             print("Nenhum arquivo registrado ainda.")
         else:
-            for filename, chunks in files.items():
+            for filename, chunks in snapshot.items():
                 print(f"- {filename}:")
                 for chunk_index, node_urls in chunks.items():
                     print(f"    Chunk {chunk_index}: {node_urls}")
@@ -77,69 +189,259 @@ def callback(ch, method, properties, body):
             filename = data["filename"]
             node_url = data["node_url"]
             chunk_index = data["chunk_index"]
+            mtime_ns = data.get("mtime_ns")
+
+            with gc_lock:
+                node_pending = pending_deletes.get(node_url, {})
+                if data.get("replica") and node_pending.get((filename, chunk_index), 0) is None:
+                    # Réplica encomendada antes da remoção do arquivo: agora se sabe qual cópia apagar
+                    node_pending[(filename, chunk_index)] = mtime_ns
+                    return
+                # Um novo upload com o mesmo nome não pode ser apagado pelo coletor
+                node_pending.pop((filename, chunk_index), None)
 
-            if filename not in files:
-                files[filename] = {}
+            with files_lock:
+                replica_mtimes[(filename, chunk_index, node_url)] = mtime_ns
+                corrupt_replicas.discard((filename, chunk_index, node_url))
+                node_urls = files.setdefault(filename, {}).setdefault(chunk_index, [])
+                if node_url not in node_urls:
+                    node_urls.append(node_url)
+                    node_chunks.setdefault(node_url, set()).add((filename, chunk_index))
+                    log_operation("REGISTER", f"{filename} - Chunk {chunk_index} registrado em {node_url}")
 
-            if chunk_index not in files[filename]:
-                files[filename][chunk_index] = []
+            replicate_file(filename, chunk_index)
+        elif data["type"] == "corrupt_chunk":
+            filename = data["filename"]
+            node_url = data["node_url"]
+            chunk_index = data["chunk_index"]
 
-            if node_url not in files[filename][chunk_index]:
-                files[filename][chunk_index].append(node_url)
-                log_operation("REGISTER", f"{filename} - Chunk {chunk_index} registrado em {node_url}")
+            available_nodes = active_node_urls()
+            with files_lock:
+                node_urls = files.get(filename, {}).get(chunk_index, [])
+                if node_url not in node_urls:
+                    return
+                healthy_nodes = [node for node in node_urls
+                                 if node != node_url and node in available_nodes
+                                 and (filename, chunk_index, node) not in corrupt_replicas]
+                if healthy_nodes:
+                    # Descarta a réplica corrompida; a lista nunca fica vazia, pois há outra cópia íntegra
+                    node_urls.remove(node_url)
+                    node_chunks.get(node_url, set()).discard((filename, chunk_index))
+                    replica_mtimes.pop((filename, chunk_index, node_url), None)
+                    corrupt_replicas.discard((filename, chunk_index, node_url))
+                else:
+                    # Única cópia disponível: mantém o registro para o cliente falhar no md5
+                    # em vez de receber um arquivo truncado, e não a usa como origem de réplicas
+                    corrupt_replicas.add((filename, chunk_index, node_url))
 
-            if len(files[filename][chunk_index]) < REPLICATION_FACTOR:
-                replicate_file(filename, chunk_index)
+            if not healthy_nodes:
+                print(f"{filename} - Chunk {chunk_index} corrompido em {node_url} sem outra réplica íntegra.")
+                log_operation("CHUNK LOST", f"{filename} - Chunk {chunk_index} corrompido em {node_url} sem outra réplica íntegra")
+                return
+
+            schedule_delete(node_url, filename, chunk_index, data.get("mtime_ns"))
+            log_operation("CORRUPT", f"{filename} - Chunk {chunk_index} corrompido em {node_url}")
+            enqueue_repair(filename, chunk_index)
     except Exception as e:
         print(f"Erro ao processar mensagem: {e}")
 
-def replicate_file(filename, chunk_index):
+def active_node_urls():
+    # Retorna as URLs dos nós com heartbeat recente
+    now = time.time()
+    return {info['node_url'] for info in list(nodes.values()) if now - info['last_heartbeat'] < TIMEOUT}
+
+def replicate_file(filename, chunk_index, publish_channel=None):
     # Função para replicar chunks que não atingiram o fator de replicação
-    available_nodes = [info['node_url'] for node_id, info in nodes.items() if time.time() - info['last_heartbeat'] < TIMEOUT]
-    current_nodes = files[filename][chunk_index]
+    publish_channel = publish_channel or channel
+    available_nodes = active_node_urls()
+
+    # Sob o lock apenas escolhe os destinos e atualiza o registro; a publicação ocorre fora dele
+    with files_lock:
+        if chunk_index not in files.get(filename, {}):
+            return
+        current_nodes = files[filename][chunk_index]
 
-    # Seleciona candidatos para replicação
-    candidates = [node for node in available_nodes if node not in current_nodes]
-    replicas_needed = REPLICATION_FACTOR - len(current_nodes)
+        # Réplicas em nós inativos ou corrompidas não contam para o fator de replicação
+        healthy_nodes = [node for node in current_nodes
+                         if node in available_nodes and (filename, chunk_index, node) not in corrupt_replicas]
+        candidates = [node for node in available_nodes if node not in current_nodes]
+        replicas_needed = REPLICATION_FACTOR - len(healthy_nodes)
 
-    if replicas_needed <= 0 or not candidates:
-        return
+        if replicas_needed <= 0 or not candidates or not healthy_nodes:
+            return
 
-    for node_url in candidates[:replicas_needed]:
+        targets = candidates[:replicas_needed]
+        for node_url in targets:
+            current_nodes.append(node_url)
+            node_chunks.setdefault(node_url, set()).add((filename, chunk_index))
+
+    for i, node_url in enumerate(targets):
         replication_data = {
             "type": "replicate",
             "filename": filename,
             "chunk_index": chunk_index,
-            "source_node_url": current_nodes[0],
+            "source_node_url": healthy_nodes[0],
             "target_node_url": node_url
         }
-        channel.basic_publish(exchange='', routing_key=REPLICATION_QUEUE, body=json.dumps(replication_data))
-        files[filename][chunk_index].append(node_url)
+        try:
+            publish_channel.basic_publish(exchange='', routing_key=REPLICATION_QUEUE, body=json.dumps(replication_data))
+        except Exception:
+            # Desfaz o registro dos destinos cuja ordem de replicação não foi enviada
+            with files_lock:
+                current_nodes = files.get(filename, {}).get(chunk_index, [])
+                for unsent in targets[i:]:
+                    if unsent in current_nodes:
+                        current_nodes.remove(unsent)
+                    node_chunks.get(unsent, set()).discard((filename, chunk_index))
+            raise
         log_operation("REPLICATE", f"{filename} - Chunk {chunk_index} replicado para {node_url}")
 
+def enqueue_repair(filename, chunk_index):
+    # Agenda a verificação de um chunk, ignorando os que já estão na fila
+    with files_lock:
+        if (filename, chunk_index) in pending_repairs:
+            return
+        pending_repairs.add((filename, chunk_index))
+    repair_queue.put((filename, chunk_index))
+
 def consume_queue():
     # Consome mensagens da fila manager_queue
     channel.basic_consume(queue='manager_queue', on_message_callback=callback, auto_ack=True)
     print("Manager escutando a fila manager_queue...")
     channel.start_consuming()
 
-def verify_integrity():
-    # Verifica periodicamente a integridade dos arquivos e substitui réplicas de nós inativos
+def detect_failures():
+    # Detecta nós que expiraram e agenda o reparo apenas dos chunks que eles guardavam
+    while True:
+        available_nodes = active_node_urls()
+        known_nodes = {info['node_url'] for info in list(nodes.values())}
+
+        for node_url in known_nodes - available_nodes - failed_nodes:
+            failed_nodes.add(node_url)
+            with files_lock:
+                affected = list(node_chunks.get(node_url, ()))
+            print(f"Nó {node_url} falhou. Agendando ressincronização de {len(affected)} chunks.")
+            log_operation("NODE FAILURE", f"{node_url} falhou. {len(affected)} chunks agendados para reparo")
+            for filename, chunk_index in affected:
+                enqueue_repair(filename, chunk_index)
+
+        # Nós que voltaram a enviar heartbeat podem ser detectados novamente
+        failed_nodes.intersection_update(known_nodes - available_nodes)
+        time.sleep(FAILURE_CHECK_INTERVAL)
+
+def open_repair_channel():
+    # Abre a conexão própria do repair_worker, pois o channel principal pertence à thread consume_queue
+    repair_connection = pika.BlockingConnection(pika.ConnectionParameters(RABBIT_HOST))
+    repair_channel = repair_connection.channel()
+    repair_channel.queue_declare(queue=REPLICATION_QUEUE)
+    return repair_connection, repair_channel
+
+def repair_worker():
+    # Consome a repair_queue e re-replica os chunks abaixo do fator de replicação
+    repair_connection = None
+    while True:
+        try:
+            if repair_connection is None or repair_connection.is_closed:
+                repair_connection, repair_channel = open_repair_channel()
+            # Responde aos heartbeats do broker enquanto não há reparos pendentes
+            repair_connection.process_data_events()
+        except pika.exceptions.AMQPError as e:
+            print(f"Erro na conexão de reparo com o RabbitMQ: {e}")
+            repair_connection = None
+            time.sleep(REPAIR_RETRY_INTERVAL)
+            continue
+
+        try:
+            filename, chunk_index = repair_queue.get(timeout=REPAIR_POLL_INTERVAL)
+        except queue.Empty:
+            continue
+
+        with files_lock:
+            pending_repairs.discard((filename, chunk_index))
+        try:
+            replicate_file(filename, chunk_index, repair_channel)
+        except pika.exceptions.AMQPError as e:
+            # Conexão perdida: reabre na próxima iteração e tenta o chunk novamente
+            print(f"Erro ao reparar {filename} - Chunk {chunk_index}: {e}")
+            repair_connection = None
+            enqueue_repair(filename, chunk_index)
+            time.sleep(REPAIR_RETRY_INTERVAL)
+        except Exception as e:
+            print(f"Erro ao reparar {filename} - Chunk {chunk_index}: {e}")
+
+def integrity_sweep():
+    # Varredura completa de baixa frequência para corrigir divergências não detectadas por eventos
     while True:
-        available_nodes = {info['node_url'] for node_id, info in nodes.items() if time.time() - info['last_heartbeat'] < TIMEOUT}
-        for filename, chunks in files.items():
-            for chunk_index, node_urls in chunks.items():
-                for node_url in node_urls:
-                    if node_url not in available_nodes:
-                        print(f"Nó {node_url} falhou. Verificando necessidade de ressincronização de {filename} - Chunk {chunk_index}.")
-                        log_operation("NODE FAILURE", f"{node_url} falhou. Verificando {filename} - Chunk {chunk_index}")
-                        replicate_file(filename, chunk_index)
-        time.sleep(10)
+        time.sleep(SWEEP_INTERVAL)
+        available_nodes = active_node_urls()
+        with files_lock:
+            snapshot = [(filename, chunk_index, list(node_urls))
+                        for filename, chunks in files.items()
+                        for chunk_index, node_urls in chunks.items()]
+        for filename, chunk_index, node_urls in snapshot:
+            if sum(node in available_nodes for node in node_urls) < REPLICATION_FACTOR:
+                enqueue_repair(filename, chunk_index)
+
+def schedule_delete(node_url, filename, chunk_index, mtime_ns):
+    # Agenda a remoção física de um chunk; o nó só apaga a cópia cujo mtime_ns (do próprio nó) ainda coincide
+    with gc_lock:
+        pending_deletes.setdefault(node_url, {})[(filename, chunk_index)] = mtime_ns
+
+def delete_from_node(node_url, batch):
+    # Envia uma única requisição de remoção em lote para um nó
+    chunks = [{"chunk": f"{filename}.chunk{chunk_index}", "mtime_ns": mtime_ns}
+              for (filename, chunk_index), mtime_ns in batch.items()]
+    response = requests.post(f"{node_url}/delete_batch", json={"chunks": chunks}, timeout=GC_REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return batch, response.json()["removed"]
+
+def garbage_collector():
+    # Remove fisicamente os chunks de arquivos apagados, em paralelo entre os nós
+    with concurrent.futures.ThreadPoolExecutor() as executor:
+        while True:
+            with gc_lock:
+                # Réplicas ainda sem mtime conhecido aguardam o register_file do nó
+                batches = {node_url: {key: mtime_ns for key, mtime_ns in chunks.items() if mtime_ns is not None}
+                           for node_url, chunks in pending_deletes.items()}
+
+            # Chunks registrados novamente no mesmo nó não devem ser apagados
+            with files_lock:
+                registered = [(node_url, (filename, chunk_index))
+                              for node_url, batch in batches.items()
+                              for filename, chunk_index in batch
+                              if node_url in files.get(filename, {}).get(chunk_index, [])]
+            with gc_lock:
+                for node_url, key in registered:
+                    del batches[node_url][key]
+                    pending_deletes.get(node_url, {}).pop(key, None)
+
+            future_to_node = {executor.submit(delete_from_node, node_url, batch): node_url for node_url, batch in batches.items() if batch}
+            for future in concurrent.futures.as_completed(future_to_node):
+                node_url = future_to_node[future]
+                try:
+                    sent, removed = future.result()
+                except Exception as e:
+                    # Nó inacessível: os chunks continuam pendentes para a próxima rodada
+                    print(f"Falha ao remover chunks de {node_url}: {e}")
+                    continue
+
+                with gc_lock:
+                    # Só descarta entradas que não foram reagendadas durante o envio
+                    node_pending = pending_deletes.get(node_url, {})
+                    for key, mtime_ns in sent.items():
+                        if node_pending.get(key) == mtime_ns:
+                            del node_pending[key]
+                    if not node_pending:
+                        pending_deletes.pop(node_url, None)
+                # Chunks mantidos pelo nó (mtime diferente) não entram na contagem
+                log_operation("GC", f"{len(removed)} de {len(sent)} chunks removidos de {node_url}")
+
+            time.sleep(GC_INTERVAL)
 
 @app.route('/list', methods=['GET'])
 def list_files():
     # Retorna todos os arquivos e a distribuição de seus chunks
-    return jsonify(files)
+    return jsonify(files_snapshot())
 
 @app.route('/upload_request', methods=['POST'])
 def upload_request():
@@ -147,7 +449,7 @@ def upload_request():
     data = request.get_json()
     filename = data.get('filename')
 
-    active_nodes = [info['node_url'] for node_id, info in nodes.items() if time.time() - info['last_heartbeat'] < TIMEOUT]
+    active_nodes = [info['node_url'] for node_id, info in list(nodes.items()) if time.time() - info['last_heartbeat'] < TIMEOUT]
     if active_nodes:
         return jsonify({"node_urls": active_nodes})
     return "Nenhum nó disponível no momento.", 503
@@ -155,11 +457,13 @@ def upload_request():
 @app.route('/download_location/<filename>', methods=['GET'])
 def download_location(filename):
     # Retorna a localização dos chunks disponíveis de um arquivo
-    if filename in files and files[filename]:
+    chunks = files_snapshot(filename)
+    if chunks:
+        available_nodes = active_node_urls()
         response = {}
-        for chunk_index, node_urls in files[filename].items():
+        for chunk_index, node_urls in chunks.items():
             for node_url in node_urls:
-                if any(node['node_url'] == node_url and time.time() - node['last_heartbeat'] < TIMEOUT for node in nodes.values()):
+                if node_url in available_nodes:
                     response[chunk_index] = node_url
                     break  # Garante que retornamos apenas um nó ativo por chunk
         if response:
@@ -168,24 +472,32 @@ def download_location(filename):
 
 @app.route('/remove/<filename>', methods=['DELETE'])
 def remove_file(filename):
-    # Remove um arquivo do sistema (de todos os nós e do registro)
-    if filename in files:
-        for chunk_index, node_urls in files[filename].items():
-            chunk_filename = f"{filename}.chunk{chunk_index}"
+    # Remove o arquivo do registro; a remoção dos chunks nos nós fica a cargo do coletor de lixo
+    with files_lock:
+        chunks = files.pop(filename, None)
+        if chunks is None:
+            return "Arquivo não encontrado.", 404
+        mtimes = {}
+        for chunk_index, node_urls in chunks.items():
             for node_url in node_urls:
-                try:
-                    requests.delete(f"{node_url}/delete/{chunk_filename}")
-                except Exception as e:
-                    print(f"Falha ao remover {chunk_filename} de {node_url}: {e}")
+                node_chunks.get(node_url, set()).discard((filename, chunk_index))
+                mtimes[(chunk_index, node_url)] = replica_mtimes.pop((filename, chunk_index, node_url), None)
+                corrupt_replicas.discard((filename, chunk_index, node_url))
 
-        del files[filename]
-        log_operation("REMOVE", f"{filename} removido do sistema.")
-        return f"Arquivo '{filename}' removido do sistema."
-    return "Arquivo não encontrado.", 404
+    for (chunk_index, node_url), mtime_ns in mtimes.items():
+        schedule_delete(node_url, filename, chunk_index, mtime_ns)
+
+    log_operation("REMOVE", f"{filename} removido do sistema.")
+    return f"Arquivo '{filename}' removido do sistema."
 
 if __name__ == "__main__":
     # Inicializa as threads do sistema
+    log_writer_thread.start()
+    atexit.register(stop_log_writer)
     threading.Thread(target=consume_queue, daemon=True).start()
     threading.Thread(target=print_dashboard, daemon=True).start()
-    threading.Thread(target=verify_integrity, daemon=True).start()
+    threading.Thread(target=detect_failures, daemon=True).start()
+    threading.Thread(target=repair_worker, daemon=True).start()
+    threading.Thread(target=integrity_sweep, daemon=True).start()
+    threading.Thread(target=garbage_collector, daemon=True).start()
     app.run(host='0.0.0.0', port=5000)
@@ -3,8 +3,9 @@ import threading
 import time
 import pika
 import json
+import hashlib
 import requests
-from flask import Flask, request, send_file
+from flask import Flask, jsonify, request, send_file
 
 # Configurações básicas do nó
 LOCAL_IP = "127.0.0.1"
@@ -18,6 +19,18 @@ RABBIT_HOST = "localhost"
 STORAGE_DIR = "storage"
 os.makedirs(STORAGE_DIR, exist_ok=True)
 
+# Configurações do scrubber de chunks
+SCRUB_INTERVAL = 3600  # Intervalo entre varreduras completas do storage
+SCRUB_RATE_BYTES = 8 * 1024 * 1024  # Taxa máxima de leitura do scrubber (bytes/s)
+SCRUB_BLOCK_SIZE = 1024 * 1024  # Tamanho de cada leitura do scrubber
+SCRUB_HEADER_MAX_BYTES = 4096  # Tamanho máximo do cabeçalho JSON escrito por criar_cabecalho
+SCRUB_MIN_AGE = 60  # Ignora chunks modificados recentemente (upload em andamento)
+SCRUB_DOWNLOAD_GRACE = 2  # Pausa extra do scrubber após o fim do último download
+
+active_downloads = 0  # Downloads ainda transmitindo dados
+last_download = 0  # Momento em que o último download terminou
+downloads_lock = threading.Lock()
+
 app = Flask(__name__)
 
 # Conexão inicial com o RabbitMQ para enviar heartbeats
@@ -33,7 +46,8 @@ def upload():
     chunk_index = int(request.form["chunk_index"])
 
     chunk_filename = f"{filename}.chunk{chunk_index}"
-    file.save(os.path.join(STORAGE_DIR, chunk_filename))
+    file_path = os.path.join(STORAGE_DIR, chunk_filename)
+    file.save(file_path)
 
     # Registra o chunk no manager
     local_connection = pika.BlockingConnection(pika.ConnectionParameters(RABBIT_HOST))
@@ -44,7 +58,8 @@ def upload():
         "type": "register_file",
         "filename": filename,
         "chunk_index": chunk_index,
-        "node_url": NODE_URL
+        "node_url": NODE_URL,
+        "mtime_ns": os.stat(file_path).st_mtime_ns
     }
 
     local_channel.basic_publish(exchange='', routing_key='manager_queue', body=json.dumps(data))
@@ -52,22 +67,49 @@ def upload():
 
     return "Chunk recebido", 200
 
-@app.route("/delete/<chunk_filename>", methods=["DELETE"])
-def delete_chunk(chunk_filename):
-    # Exclui o chunk do storage
-    file_path = os.path.join(STORAGE_DIR, chunk_filename)
-    if os.path.exists(file_path):
-        os.remove(file_path)
-        print(f"Arquivo {chunk_filename} removido do storage.")
-        return f"{chunk_filename} removido com sucesso.", 200
-    else:
-        print(f"Arquivo {chunk_filename} não encontrado no storage.")
-        return f"{chunk_filename} não encontrado.", 404
+@app.route("/delete_batch", methods=["POST"])
+def delete_batch():
+    # Exclui vários chunks do storage em uma única requisição
+    data = request.get_json(silent=True)
+    chunks = data.get("chunks") if isinstance(data, dict) else None
+    if not isinstance(chunks, list) or not all(
+            isinstance(entry, dict) and isinstance(entry.get("chunk"), str) and isinstance(entry.get("mtime_ns"), int)
+            for entry in chunks):
+        return "Requisição inválida: esperado {\"chunks\": [{\"chunk\": ..., \"mtime_ns\": ...}]}.", 400
+
+    removed = []
+    for entry in chunks:
+        chunk_filename = entry["chunk"]
+        file_path = os.path.join(STORAGE_DIR, os.path.basename(chunk_filename))
+        try:
+            # Uma cópia com outro mtime pertence a um novo upload e é mantida
+            if os.stat(file_path).st_mtime_ns != entry["mtime_ns"]:
+                continue
+            os.remove(file_path)
+            removed.append(chunk_filename)
+        except FileNotFoundError:
+            pass
+    print(f"{len(removed)} de {len(chunks)} chunks removidos do storage.")
+    return jsonify({"removed": removed}), 200
+
+def finish_download():
+    # Chamado quando a resposta do /download termina de ser transmitida
+    global active_downloads, last_download
+    with downloads_lock:
+        active_downloads -= 1
+        last_download = time.time()
 
 @app.route("/download/<chunk_filename>")
 def download(chunk_filename):
     # Faz o download do chunk
-    return send_file(os.path.join(STORAGE_DIR, chunk_filename))
+    global active_downloads
+    response = send_file(os.path.join(STORAGE_DIR, chunk_filename))
+
+    # send_file continua transmitindo após o retorno; o download só termina no fechamento da resposta
+    with downloads_lock:
+        active_downloads += 1
+    response.call_on_close(finish_download)
+    return response
 
 @app.route("/replicate", methods=["POST"])
 def replicate():
@@ -78,7 +120,8 @@ def replicate():
 
     chunk_filename = f"{filename}.chunk{chunk_index}"
     r = requests.get(f"{source_node}/download/{chunk_filename}")
-    with open(os.path.join(STORAGE_DIR, chunk_filename), 'wb') as f:
+    file_path = os.path.join(STORAGE_DIR, chunk_filename)
+    with open(file_path, 'wb') as f:
         f.write(r.content)
 
     # Registra a réplica no manager
@@ -90,7 +133,9 @@ def replicate():
         "type": "register_file",
         "filename": filename,
         "chunk_index": chunk_index,
-        "node_url": NODE_URL
+        "node_url": NODE_URL,
+        "mtime_ns": os.stat(file_path).st_mtime_ns,
+        "replica": True
     }
 
     local_channel.basic_publish(exchange='', routing_key='manager_queue', body=json.dumps(data))
@@ -98,6 +143,88 @@ def replicate():
 
     return "Réplica criada", 200
 
+def verify_chunk(file_path):
+    # Relê o chunk respeitando a taxa do scrubber e compara o corpo com o md5 do cabeçalho
+    md5 = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        # Cabeçalho limitado: sem o '\n' nos primeiros bytes o chunk é considerado corrompido
+        header_line = f.readline(SCRUB_HEADER_MAX_BYTES)
+        if not header_line.endswith(b'\n'):
+            raise ValueError("fim do cabeçalho não encontrado")
+        header = json.loads(header_line.decode('utf-8'))
+        while True:
+            # Cede a vez aos downloads em andamento
+            while active_downloads > 0 or time.time() - last_download < SCRUB_DOWNLOAD_GRACE:
+                time.sleep(SCRUB_DOWNLOAD_GRACE)
+
+            start = time.time()
+            block = f.read(SCRUB_BLOCK_SIZE)
+            if not block:
+                break
+            md5.update(block)
+
+            # Limita a taxa de leitura para não competir com o /download
+            elapsed = time.time() - start
+            time.sleep(max(0, len(block) / SCRUB_RATE_BYTES - elapsed))
+    return header, md5.hexdigest() == header["md5"]
+
+def report_corrupt_chunk(filename, chunk_index, mtime_ns):
+    # Informa o manager para descartar esta réplica e replicar a partir de uma cópia íntegra
+    local_connection = pika.BlockingConnection(pika.ConnectionParameters(RABBIT_HOST))
+    local_channel = local_connection.channel()
+    local_channel.queue_declare(queue='manager_queue')
+
+    data = {
+        "type": "corrupt_chunk",
+        "filename": filename,
+        "chunk_index": chunk_index,
+        "node_url": NODE_URL,
+        "mtime_ns": mtime_ns
+    }
+
+    local_channel.basic_publish(exchange='', routing_key='manager_queue', body=json.dumps(data))
+    local_connection.close()
+
+def scrub_chunks():
+    # Varre periodicamente o storage em busca de chunks corrompidos
+    while True:
+        for chunk_filename in os.listdir(STORAGE_DIR):
+            file_path = os.path.join(STORAGE_DIR, chunk_filename)
+            try:
+                stat_before = os.stat(file_path)
+                if time.time() - stat_before.st_mtime < SCRUB_MIN_AGE:
+                    continue
+                try:
+                    header, intact = verify_chunk(file_path)
+                    filename, chunk_index = header["filename"], header["chunk_index"]
+                except FileNotFoundError:
+                    raise
+                except Exception as e:
+                    # Cabeçalho ilegível também indica corrupção
+                    print(f"Cabeçalho inválido em {chunk_filename}: {e}")
+                    intact = False
+                    filename, _, chunk_index = chunk_filename.rpartition(".chunk")
+                    if not filename or not chunk_index.isdigit():
+                        continue
+                    chunk_index = int(chunk_index)
+
+                # Um /upload ou /replicate durante a leitura invalida o resultado
+                stat_after = os.stat(file_path)
+                if (stat_after.st_mtime, stat_after.st_size) != (stat_before.st_mtime, stat_before.st_size):
+                    continue
+            except FileNotFoundError:
+                continue  # Removido durante a varredura
+
+            if not intact:
+                # A remoção do arquivo fica a cargo do coletor de lixo do manager;
+                # se o aviso falhar, o chunk é reportado de novo na próxima varredura
+                print(f"Chunk {chunk_filename} corrompido. Reportando ao manager.")
+                try:
+                    report_corrupt_chunk(filename, chunk_index, stat_before.st_mtime_ns)
+                except Exception as e:
+                    print(f"Erro ao reportar chunk corrompido {chunk_filename}: {e}")
+        time.sleep(SCRUB_INTERVAL)
+
 def send_heartbeat():
     # Envia heartbeat para o manager periodicamente
     while True:
@@ -135,9 +262,10 @@ def consume_replication_queue():
     print(f"Nó {NODE_ID} escutando fila de replicacao...")
     replication_channel.start_consuming()
 
-# Inicia as threads de heartbeat e de consumo da fila de replicação
+# Inicia as threads de heartbeat, de consumo da fila de replicação e do scrubber
 threading.Thread(target=send_heartbeat, daemon=True).start()
 threading.Thread(target=consume_replication_queue, daemon=True).start()
+threading.Thread(target=scrub_chunks, daemon=True).start()
 
 if __name__ == "__main__":
     print(f"Nó iniciado: {NODE_ID} @ {NODE_URL} → Enviando heartbeats para {RABBIT_HOST}")